@@ -1,15 +1,133 @@
 #!/usr/bin/env python3
 """
 Bot Performance Analyzer
-Reads bot_history.jsonl and portfolio.json, generates insights.
+Reads bot_history.jsonl, closed_positions.jsonl and portfolio.json,
+generates insights. Totals for the JSONL logs are cached in *.stats.json
+sidecars, so each run only parses lines appended since the last one.
 """
 
+import hashlib
 import json
+import os
+from collections import Counter
+from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
+
+try:
+    import orjson  # Optional: much faster JSON decode
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 HISTORY_FILE = Path(__file__).parent / "bot_history.jsonl"
 PORTFOLIO_FILE = Path(__file__).parent / "portfolio.json"
+HISTORY_STATS_FILE = Path(__file__).parent / "bot_history.stats.json"
+CLOSED_POSITIONS_FILE = Path(__file__).parent / "closed_positions.jsonl"
+CLOSED_STATS_FILE = Path(__file__).parent / "closed_positions.stats.json"
+
+def load_stats(path: Path, empty: dict) -> dict:
+    """Load cached aggregates for a JSONL file, or start from `empty`."""
+    try:
+        return {**empty, **json_loads(path.read_bytes())}
+    except (OSError, json.JSONDecodeError):
+        return dict(empty)
+
+def save_stats(path: Path, stats: dict):
+    """Write cached aggregates atomically."""
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(stats))
+    os.replace(tmp, path)
+
+def tail_jsonl(path: Path, stats: dict, empty: dict, limit: int = None) -> tuple:
+    """
+    Parse only the lines appended to `path` since stats["offset"], reading
+    no further than `limit` bytes into the file if given.
+    
+    Returns (stats, rows). Stats are reset to `empty` if the file is not the
+    one they were built from (different inode or first line, e.g. replaced
+    or rotated) or shrank below the offset. A trailing partial line is left
+    for next time.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        file_id = f"{st.st_ino}:{hashlib.blake2b(f.readline(), digest_size=8).hexdigest()}"
+        size = st.st_size if limit is None else min(st.st_size, limit)
+        if file_id != stats.get("file_id") or size < stats["offset"]:
+            stats = {**empty, "file_id": file_id}
+        
+        f.seek(stats["offset"])
+        data = f.read(size - stats["offset"])
+    end = data.rfind(b"\n") + 1
+    
+    rows = []
+    for line in data[:end].splitlines():
+        stats["lines"] += 1
+        if not line.strip():
+            continue
+        try:
+            rows.append(json_loads(line))
+        except json.JSONDecodeError as e:
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            print(f"   ⚠️  Skipping corrupt line {stats['lines']}: {e}")
+    stats["offset"] += end
+    return stats, rows
+
+def decision_ts(d: dict):
+    """Decision time in Unix microseconds; older entries carry an ISO "timestamp"."""
+    if 'ts' in d:
+        return d['ts']
+    try:
+        return int(datetime.fromisoformat(d['timestamp']).timestamp() * 1_000_000)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def update_history_stats() -> dict:
+    """Fold decisions logged since the last analysis into the cached counters."""
+    empty = {"offset": 0, "lines": 0, "n_decisions": 0, "executed": 0, "edge_types": {},
+             "first_ts": None, "last_ts": None}
+    stats, decisions = tail_jsonl(HISTORY_FILE, load_stats(HISTORY_STATS_FILE, empty), empty)
+    
+    edge_types = stats["edge_types"] = Counter(stats["edge_types"])
+    for d in decisions:
+        stats["n_decisions"] += 1
+        stats["executed"] += bool(d.get('executed'))
+        edge_types[d.get('edge_type', 'unknown')] += 1
+    
+    stamps = [ts for ts in map(decision_ts, decisions) if ts is not None]
+    if stamps:
+        if stats["first_ts"] is None:
+            stats["first_ts"] = stamps[0]
+        stats["last_ts"] = stamps[-1]
+    
+    save_stats(HISTORY_STATS_FILE, stats)
+    return stats
+
+def fold_closed(stats: dict, positions: list):
+    """Accumulate win/loss totals for closed positions in a single pass."""
+    for p in positions:
+        pnl = p.get('pnl', 0)
+        stats["n_closed"] += 1
+        if pnl > 0:
+            stats["n_wins"] += 1
+            stats["total_win"] += pnl
+        else:
+            stats["total_loss"] += pnl
+
+def update_closed_stats(limit: int = None) -> dict:
+    """
+    Fold positions closed since the last analysis into the cached totals.
+    
+    `limit` is portfolio["closed_log_bytes"]: log lines past it belong to a
+    save that never completed and aren't counted.
+    """
+    empty = {"offset": 0, "lines": 0, "n_closed": 0, "n_wins": 0, "total_win": 0.0, "total_loss": 0.0}
+    if not CLOSED_POSITIONS_FILE.exists():
+        return dict(empty)
+    
+    stats, closed = tail_jsonl(CLOSED_POSITIONS_FILE, load_stats(CLOSED_STATS_FILE, empty), empty, limit)
+    fold_closed(stats, closed)
+    save_stats(CLOSED_STATS_FILE, stats)
+    return stats
 
 def analyze():
     print("\n" + "="*70)
@@ -21,35 +139,37 @@ def analyze():
         print("❌ No portfolio.json found. Run the bot first!")
         return
     
-    with open(PORTFOLIO_FILE) as f:
-        portfolio = json.load(f)
+    portfolio = json_loads(PORTFOLIO_FILE.read_bytes())
+    
+    # Closed positions stream from closed_positions.jsonl; older portfolio
+    # files may still carry some inline until the bot next saves
+    closed = update_closed_stats(portfolio.get('closed_log_bytes'))
+    fold_closed(closed, portfolio.get('closed_positions', []))
+    n_closed = closed["n_closed"]
     
     # Summary
     print("💰 PORTFOLIO SUMMARY")
     print(f"   Current capital: M${portfolio['capital']:.0f}")
     print(f"   Total P&L: M${portfolio['total_pnl']:+.2f}")
     print(f"   Open positions: {len(portfolio['positions'])}")
-    print(f"   Closed positions: {len(portfolio['closed_positions'])}")
+    print(f"   Closed positions: {n_closed}")
     
-    if portfolio['closed_positions']:
-        closed = portfolio['closed_positions']
-        wins = [p for p in closed if p.get('pnl', 0) > 0]
-        losses = [p for p in closed if p.get('pnl', 0) <= 0]
+    if n_closed:
+        n_wins = closed["n_wins"]
+        n_losses = n_closed - n_wins
+        total_win = closed["total_win"]
+        total_loss = closed["total_loss"]
         
-        win_rate = len(wins) / len(closed) * 100
-        total_win = sum(p.get('pnl', 0) for p in wins)
-        total_loss = sum(p.get('pnl', 0) for p in losses)
+        win_rate = n_wins / n_closed * 100
+        avg_pnl = (total_win + total_loss) / n_closed
         
         print(f"\n🎯 CLOSED POSITIONS")
-        print(f"   Total: {len(closed)}")
-        print(f"   Wins: {len(wins)} ({win_rate:.1f}%)")
-        print(f"   Losses: {len(losses)}")
+        print(f"   Total: {n_closed}")
+        print(f"   Wins: {n_wins} ({win_rate:.1f}%)")
+        print(f"   Losses: {n_losses}")
         print(f"   Total profit: M${total_win:+.2f}")
         print(f"   Total loss: M${total_loss:+.2f}")
-        
-        if closed:
-            avg_pnl = sum(p.get('pnl', 0) for p in closed) / len(closed)
-            print(f"   Avg P&L per trade: M${avg_pnl:+.2f}")
+        print(f"   Avg P&L per trade: M${avg_pnl:+.2f}")
     
     # Open positions
     if portfolio['positions']:
@@ -62,28 +182,25 @@ def analyze():
     if HISTORY_FILE.exists():
         print(f"\n📋 DECISION HISTORY")
         
-        decisions = []
-        with open(HISTORY_FILE) as f:
-            for line in f:
-                try:
-                    decisions.append(json.loads(line))
-                except:
-                    pass
+        # Only new lines are parsed; totals come from the cached counters
+        stats = update_history_stats()
+        n_decisions = stats["n_decisions"]
         
-        if decisions:
-            executed = sum(1 for d in decisions if d.get('executed'))
-            skipped = len(decisions) - executed
-            
-            edge_types = defaultdict(int)
-            for d in decisions:
-                edge_types[d.get('edge_type', 'unknown')] += 1
+        if n_decisions:
+            executed = stats["executed"]
+            skipped = n_decisions - executed
+            edge_types = stats["edge_types"]
             
-            print(f"   Total decisions: {len(decisions)}")
+            print(f"   Total decisions: {n_decisions}")
             print(f"   Executed: {executed}")
             print(f"   Skipped: {skipped}")
+            if stats["last_ts"] is not None:
+                first = datetime.fromtimestamp(stats["first_ts"] / 1e6).isoformat(timespec="seconds")
+                last = datetime.fromtimestamp(stats["last_ts"] / 1e6).isoformat(timespec="seconds")
+                print(f"   Period: {first} → {last}")
             print(f"\n   By edge type:")
-            for edge_type, count in sorted(edge_types.items(), key=lambda x: -x[1]):
-                pct = count / len(decisions) * 100
+            for edge_type, count in edge_types.most_common():
+                pct = count / n_decisions * 100
                 print(f"      {edge_type}: {count} ({pct:.0f}%)")
     
     print("\n" + "="*70 + "\n")
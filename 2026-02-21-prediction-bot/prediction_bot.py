@@ -14,17 +14,31 @@ Designed as a building block toward full agentic investing.
 Author: 2am experiment, Feb 2026
 """
 
+import atexit
 import json
 import os
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
+import urllib.parse
 import urllib.request
-import urllib.error
+import http.client
+import base64
+import gzip
 import time
-from typing import Optional, Dict, List, Tuple
-from dataclasses import dataclass, asdict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Iterable
+from dataclasses import dataclass
 import hashlib
+from bisect import bisect_left
+from functools import lru_cache
+from operator import mul
+
+try:
+    import orjson  # Optional: much faster JSON encode/decode
+except ImportError:
+    orjson = None
 
 # ============================================================================
 # Configuration
@@ -33,6 +47,20 @@ import hashlib
 MANIFOLD_API = "https://api.manifold.markets/v0"
 HISTORY_FILE = Path(__file__).parent / "bot_history.jsonl"
 PORTFOLIO_FILE = Path(__file__).parent / "portfolio.json"
+CLOSED_POSITIONS_FILE = Path(__file__).parent / "closed_positions.jsonl"
+HISTORY_CACHE_DIR = Path(__file__).parent / ".history_cache"
+
+# API client config
+MAX_WORKERS = 12  # Concurrent history fetches
+HISTORY_TOP_N = 50  # Mean-reversion needs history: top N markets by volume
+RATE_LIMIT = 5  # Sustained requests per second against Manifold
+RATE_BURST = 5  # Requests allowed back-to-back before the rate limit kicks in
+MAX_RETRIES = 3  # Retries on connection errors / 429 / 5xx
+RETRY_BACKOFF = 0.3  # Seconds; doubles each retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+USER_AGENT = "prediction-bot/1.0"
 
 # Bot config
 CONFIG = {
@@ -43,11 +71,26 @@ CONFIG = {
     "check_interval": 300,  # Check markets every 5 min in real trading
 }
 
+# Cached histories stay fresh a little past one check interval, so the next
+# scheduled run (e.g. */5 cron) still hits despite start-time jitter
+HISTORY_CACHE_TTL = CONFIG["check_interval"] + 60
+
+if orjson:
+    json_loads = orjson.loads
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+else:
+    json_loads = json.loads
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
 # ============================================================================
 # Data Structures
 # ============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class Market:
     id: str
     title: str
@@ -59,7 +102,7 @@ class Market:
     resolution: Optional[str] = None
     last_updated: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class TradeSignal:
     market_id: str
     market_title: str
@@ -71,7 +114,7 @@ class TradeSignal:
     confidence: float  # 0-1
     rationale: str
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     market_id: str
     market_title: str
@@ -83,19 +126,131 @@ class Position:
     exit_prob: Optional[float] = None
     exit_time: Optional[int] = None
     pnl: Optional[float] = None
+    
+    def to_dict(self) -> Dict:
+        """Plain dict for the portfolio file (flat fields; no asdict deepcopy)."""
+        return {
+            "market_id": self.market_id,
+            "market_title": self.market_title,
+            "side": self.side,
+            "entry_prob": self.entry_prob,
+            "size": self.size,
+            "entry_time": self.entry_time,
+            "status": self.status,
+            "exit_prob": self.exit_prob,
+            "exit_time": self.exit_time,
+            "pnl": self.pnl,
+        }
 
 # ============================================================================
 # API Client
 # ============================================================================
 
+class TokenBucket:
+    """
+    Rate limiter shared across threads: up to `capacity` requests go out
+    immediately, after which starts are paced at `rate` per second.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # Going negative reserves a future slot, so waiters sleep outside the lock
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+_RATE_LIMITER = TokenBucket(RATE_LIMIT, RATE_BURST)
+
+_LOCAL = threading.local()
+
+def _connection(host: str) -> http.client.HTTPSConnection:
+    """
+    Per-thread keep-alive connection, so TLS setup is paid once per worker.
+    Honours HTTPS_PROXY / NO_PROXY like urllib does, tunnelling via CONNECT.
+    """
+    if not hasattr(_LOCAL, "conns"):
+        _LOCAL.conns = {}
+    conn = _LOCAL.conns.get(host)
+    if conn is not None:
+        return conn
+    
+    proxy = urllib.request.getproxies().get("https")
+    if proxy and not urllib.request.proxy_bypass(urllib.parse.urlsplit(f"//{host}").hostname):
+        if "://" not in proxy:
+            proxy = f"http://{proxy}"
+        p = urllib.parse.urlsplit(proxy)
+        headers = {}
+        if p.username:
+            creds = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+            headers["Proxy-Authorization"] = "Basic " + base64.b64encode(creds.encode()).decode()
+        conn = http.client.HTTPSConnection(p.hostname, p.port or 80, timeout=10)
+        conn.set_tunnel(host, headers=headers)
+    else:
+        conn = http.client.HTTPSConnection(host, timeout=10)
+    _LOCAL.conns[host] = conn
+    return conn
+
+def _get(url: str) -> Optional[Tuple[http.client.HTTPResponse, bytes]]:
+    """GET `url`, retrying connection errors and RETRY_STATUSES. None if retries run out."""
+    parts = urllib.parse.urlsplit(url)
+    path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    headers = {"Accept": "application/json", "Accept-Encoding": "gzip", "User-Agent": USER_AGENT}
+    
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        _RATE_LIMITER.acquire()
+        conn = _connection(parts.netloc)
+        try:
+            conn.request("GET", path or "/", headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()  # Stale keep-alive socket; reconnect on retry
+            error = e
+            continue
+        
+        if response.status in RETRY_STATUSES:
+            error = f"HTTP {response.status}"
+            continue
+        return response, body
+    
+    print(f"⚠️  API error: {error} (after {MAX_RETRIES} retries)")
+    return None
+
 def fetch_json(url: str) -> Optional[dict]:
-    """Fetch JSON from URL with error handling."""
-    try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.URLError as e:
-        print(f"⚠️  API error: {e}")
+    """Fetch JSON from URL with error handling, retrying transient failures and following redirects."""
+    for _ in range(MAX_REDIRECTS + 1):
+        result = _get(url)
+        if result is None:
+            return None
+        response, body = result
+        if response.status not in REDIRECT_STATUSES:
+            break
+        url = urllib.parse.urljoin(url, response.getheader("Location", ""))
+    else:
+        print(f"⚠️  API error: more than {MAX_REDIRECTS} redirects for {url}")
+        return None
+    
+    if response.status != 200:
+        print(f"⚠️  API error: HTTP {response.status} for {url}")
         return None
+    
+    try:
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json_loads(body)
     except Exception as e:
         print(f"❌ Error fetching {url}: {e}")
         return None
@@ -109,44 +264,124 @@ def get_markets() -> List[Market]:
     if not data:
         return []
     
-    markets = []
     now = int(time.time())
+    default_close_ms = (now + 86400 * 365) * 1000
     
-    for m in data:
-        # Filter: binary markets, not resolved, with volume
-        if m.get("type") != "BINARY_MARKET":
-            continue
-        if m.get("isResolved"):
-            continue
-        if m.get("volume24h", 0) < 100:  # Ignore low-volume markets
-            continue
-        
-        market = Market(
+    # Filter: binary markets, not resolved, with volume (ignore low-volume);
+    # volume24h is known present once the filter passes
+    markets = [
+        Market(
             id=m.get("id", ""),
             title=m.get("question", "Unknown"),
             current_probability=m.get("probability", 0.5),
-            volume_24h=m.get("volume24h", 0),
-            created_at=int(m.get("createdTime", 0) / 1000),
-            closes_at=int(m.get("closeTime", now + 86400 * 365) / 1000),
-            is_resolved=m.get("isResolved", False),
+            volume_24h=m["volume24h"],
+            created_at=m.get("createdTime", 0) // 1000,
+            closes_at=m.get("closeTime", default_close_ms) // 1000,
+            is_resolved=False,
             last_updated=now,
         )
-        markets.append(market)
+        for m in data
+        if m.get("type") == "BINARY_MARKET"
+        and not m.get("isResolved")
+        and m.get("volume24h", 0) >= 100
+    ]
     
     print(f"✅ Loaded {len(markets)} active markets")
     return markets
 
 def get_market_history(market_id: str) -> Optional[List[Dict]]:
-    """Fetch recent probability history for a market."""
+    """Fetch recent probability history for a market (cached per check interval)."""
+    bucket = int(time.time()) // CONFIG["check_interval"]
+    return _cached_market_history(market_id, bucket)
+
+_CACHE_KEY_HASH = hashlib.blake2b(digest_size=8)  # Prototype; copied per key, never updated
+
+def _history_cache_path(market_id: str) -> Path:
+    """On-disk cache file for a market, named by the 8-byte blake2b of its id."""
+    h = _CACHE_KEY_HASH.copy()
+    h.update(market_id.encode())
+    return HISTORY_CACHE_DIR / f"{h.hexdigest()}.json"
+
+def _prune_history_cache():
+    """
+    Delete cache entries older than the TTL. Called from prefetch_histories
+    before the fetches fan out, so it never runs inside the pool workers.
+    """
+    if not HISTORY_CACHE_DIR.is_dir():
+        return
+    
+    cutoff = time.time() - HISTORY_CACHE_TTL
+    for path in HISTORY_CACHE_DIR.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass  # Removed or rewritten by a concurrent run; leave it
+
+@lru_cache(maxsize=2048)
+def _cached_market_history(market_id: str, bucket: int) -> List[Dict]:
+    """
+    History lookup behind an on-disk cache that lives for HISTORY_CACHE_TTL,
+    so the next scheduled run (e.g. cron) skips the network for unchanged
+    markets. `bucket` only keys the in-process cache.
+    """
+    path = _history_cache_path(market_id)
+    
+    try:
+        if time.time() - path.stat().st_mtime < HISTORY_CACHE_TTL:
+            return json_loads(path.read_bytes())
+    except (OSError, json.JSONDecodeError):
+        pass  # Missing or unreadable cache entry: refetch
+    
     url = f"{MANIFOLD_API}/market/{market_id}/history"
     data = fetch_json(url)
-    return data if data else []
+    if not data:
+        return []
+    
+    try:
+        HISTORY_CACHE_DIR.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(json_dumps(data))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️  Could not cache history for {market_id}: {e}")
+    return data
 
 # ============================================================================
 # Analysis Engine
 # ============================================================================
 
-def detect_mean_reversion(market: Market, history: List[Dict]) -> Optional[TradeSignal]:
+def _mean_reversion_kernel(probs: List[float]) -> Tuple[float, float, float]:
+    """
+    Numeric core of detect_mean_reversion over a flat probability series.
+    
+    Returns (move, fair_value, edge), where fair value is the linearly
+    weighted average (weights 1..n, recent = more weight).
+    """
+    n = len(probs)
+    current_prob = probs[-1]
+    move = abs(current_prob - probs[0])
+    fair_value = sum(map(mul, probs, range(1, n + 1))) / (n * (n + 1) / 2)
+    return move, fair_value, abs(current_prob - fair_value)
+
+# Resolution-arb window, shared by the single-market and batch screens
+RESOLUTION_ARB_WINDOW = 7 * 86400  # Seconds to close
+RESOLUTION_ARB_PROB_MIN = 0.4
+RESOLUTION_ARB_PROB_MAX = 0.6
+
+def _resolution_arb_kernel(prob: float, closes_at: int, now: int) -> Optional[float]:
+    """
+    Numeric core of detect_resolution_arbitrage.
+    
+    Returns days to close if the market closes within RESOLUTION_ARB_WINDOW
+    and is priced near 50-50 (RESOLUTION_ARB_PROB_MIN-MAX), else None.
+    """
+    if (now <= closes_at <= now + RESOLUTION_ARB_WINDOW
+            and RESOLUTION_ARB_PROB_MIN <= prob <= RESOLUTION_ARB_PROB_MAX):
+        return (closes_at - now) / 86400  # Days
+    return None
+
+def detect_mean_reversion(market: Market, history: List[Dict], now: Optional[int] = None) -> Optional[TradeSignal]:
     """
     Detect mean-reversion edge: crowd overreacts to news, probability swings
     beyond fair value, then reverts.
@@ -157,30 +392,23 @@ def detect_mean_reversion(market: Market, history: List[Dict]) -> Optional[Trade
     if not history or len(history) < 10:
         return None
     
-    # Get recent history (last 24h)
-    now = int(time.time())
-    recent = [h for h in history if now - int(h.get("createdTime", 0) / 1000) < 86400]
+    # Get recent history (last 24h). History is ascending by createdTime (ms),
+    # so bisect for the cutoff; same boundary as now - t // 1000 < 86400
+    now = now or int(time.time())
+    cutoff_ms = (now - 86400 + 1) * 1000
+    recent = history[bisect_left(history, cutoff_ms, key=lambda h: h.get("createdTime", 0)):]
     
     if len(recent) < 5:
         return None
     
     probs = [float(h.get("prob", 0.5)) for h in recent]
-    
-    # Calculate move
-    prob_24h_ago = probs[0]
     current_prob = probs[-1]
-    move = abs(current_prob - prob_24h_ago)
+    move, fair_value, edge = _mean_reversion_kernel(probs)
     
     if move < 0.10:  # No significant move
         return None
     
-    # Fair value: weighted average (recent = more weight)
-    weights = [i + 1 for i in range(len(probs))]
-    fair_value = sum(p * w for p, w in zip(probs, weights)) / sum(weights)
-    
     # Detect reversion: if current is far from fair, expect reversion
-    edge = abs(current_prob - fair_value)
-    
     if edge < 0.05:  # Too small
         return None
     
@@ -204,28 +432,8 @@ def detect_mean_reversion(market: Market, history: List[Dict]) -> Optional[Trade
         rationale=f"Market moved {move*100:.1f}% in 24h. Fair value ≈ {fair_value:.2%}, current {current_prob:.2%}. Mean-reversion likely.",
     )
 
-def detect_resolution_arbitrage(market: Market) -> Optional[TradeSignal]:
-    """
-    Detect resolution arbitrage: market resolves soon but probability hasn't
-    converged to likely outcome.
-    
-    Signal: If <7 days to resolution and probability is near 50%, high uncertainty.
-    If market is about a highly predictable outcome (e.g., past deadline), mispricing likely.
-    """
-    now = int(time.time())
-    time_to_close = (market.closes_at - now) / 86400  # Days
-    
-    if time_to_close < 0:  # Already closed
-        return None
-    
-    if time_to_close > 7:  # Not soon enough
-        return None
-    
-    # If very close to 50-50, it's uncertain — but high volatility = opportunity
-    if market.current_probability < 0.4 or market.current_probability > 0.6:
-        # Probability is strong; assume market is pricing correctly
-        return None
-    
+def _resolution_arb_signal(market: Market, time_to_close: float) -> TradeSignal:
+    """Build the resolution-arb TradeSignal for a market inside the window."""
     # Near 50%, and imminent resolution = uncertain market = potential mispricing
     confidence = 0.5
     side = "YES" if market.current_probability < 0.5 else "NO"
@@ -242,29 +450,81 @@ def detect_resolution_arbitrage(market: Market) -> Optional[TradeSignal]:
         rationale=f"Resolves in {time_to_close:.1f} days. Near 50-50 suggests unresolved outcome. High uncertainty = potential edge.",
     )
 
-def analyze_markets(markets: List[Market]) -> List[TradeSignal]:
-    """Analyze all markets for trading edges."""
+def detect_resolution_arbitrage(market: Market, now: Optional[int] = None) -> Optional[TradeSignal]:
+    """
+    Detect resolution arbitrage: market resolves soon but probability hasn't
+    converged to likely outcome.
+    
+    Signal: If <7 days to resolution and probability is near 50%, high uncertainty.
+    If market is about a highly predictable outcome (e.g., past deadline), mispricing likely.
+    """
+    now = now or int(time.time())
+    
+    # Must close within 7 days and sit near 50-50; a strong probability
+    # means the market is likely pricing correctly already
+    time_to_close = _resolution_arb_kernel(market.current_probability, market.closes_at, now)
+    if time_to_close is None:
+        return None
+    
+    return _resolution_arb_signal(market, time_to_close)
+
+def detect_resolution_arbitrage_batch(markets: List[Market], now: Optional[int] = None) -> Dict[int, TradeSignal]:
+    """
+    Screen every market for resolution arbitrage in one pass.
+    
+    Same window constants as _resolution_arb_kernel, but compared inline
+    against bounds computed once, so there is no Python call per market;
+    days to close and TradeSignals are only built for the hits.
+    Returns {index: signal} keyed by position in `markets`, ascending.
+    """
+    now = now or int(time.time())
+    horizon = now + RESOLUTION_ARB_WINDOW
+    lo, hi = RESOLUTION_ARB_PROB_MIN, RESOLUTION_ARB_PROB_MAX
+    
+    return {
+        i: _resolution_arb_signal(m, (m.closes_at - now) / 86400)
+        for i, m in enumerate(markets)
+        if now <= m.closes_at <= horizon and lo <= m.current_probability <= hi
+    }
+
+def prefetch_histories(markets: List[Market], executor: ThreadPoolExecutor) -> Iterable[List[Dict]]:
+    """Start fetching histories for the top markets; yields them in volume order."""
+    _prune_history_cache()
+    return executor.map(get_market_history, [m.id for m in markets[:HISTORY_TOP_N]])
+
+def analyze_markets(markets: List[Market], histories: Optional[Iterable[List[Dict]]] = None) -> List[TradeSignal]:
+    """
+    Analyze all markets for trading edges.
+    
+    `histories` are the top markets' histories from prefetch_histories, so
+    callers can get them in flight early; if omitted they are fetched here.
+    """
+    if histories is None:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            return analyze_markets(markets, prefetch_histories(markets, executor))
+    
     signals = []
+    min_edge = CONFIG["min_edge_threshold"] * 100
     
-    print("\n📊 Analyzing markets for edges...")
-    for i, market in enumerate(markets[:50]):  # Analyze top 50 by volume
-        # Fetch history
-        history = get_market_history(market.id)
-        
-        # Check mean-reversion
-        signal = detect_mean_reversion(market, history or [])
-        if signal and signal.edge_percent > CONFIG["min_edge_threshold"] * 100:
+    def add(signal: Optional[TradeSignal]):
+        if signal and signal.edge_percent > min_edge:
             signals.append(signal)
-            print(f"  ✨ {signal.edge_type}: {market.title[:60]}")
-        
-        # Check resolution arb
-        signal = detect_resolution_arbitrage(market)
-        if signal and signal.edge_percent > CONFIG["min_edge_threshold"] * 100:
-            signals.append(signal)
-            print(f"  ✨ {signal.edge_type}: {market.title[:60]}")
-        
-        # Rate limit: 1 request per market
-        time.sleep(0.2)
+            print(f"  ✨ {signal.edge_type}: {signal.market_title[:60]}")
+    
+    print("\n📊 Analyzing markets for edges...")
+    now = int(time.time())  # One clock reading for the whole pass
+    
+    # Resolution arb needs no history, so screen every market in one pass
+    res_arb = detect_resolution_arbitrage_batch(markets, now)
+    
+    # Histories arrive in volume order as their fetches land
+    for i, (market, history) in enumerate(zip(markets[:HISTORY_TOP_N], histories)):
+        add(detect_mean_reversion(market, history or [], now))
+        add(res_arb.pop(i, None))
+    
+    # Remaining resolution-arb hits beyond the top N, still in volume order
+    for signal in res_arb.values():
+        add(signal)
     
     print(f"✅ Found {len(signals)} trading signals")
     return signals
@@ -273,24 +533,67 @@ def analyze_markets(markets: List[Market]) -> List[TradeSignal]:
 # Portfolio & Execution
 # ============================================================================
 
+def _closed_log_size() -> int:
+    """Current byte length of closed_positions.jsonl (0 if missing)."""
+    try:
+        return CLOSED_POSITIONS_FILE.stat().st_size
+    except FileNotFoundError:
+        return 0
+
 def load_portfolio() -> Dict:
-    """Load portfolio from file, or initialize."""
+    """
+    Load portfolio from file, or initialize.
+    
+    portfolio["closed_positions"] only holds positions closed since the last
+    save; earlier ones live in closed_positions.jsonl, counted by "n_closed".
+    "closed_log_bytes" is the log length that portfolio.json accounts for.
+    """
     if PORTFOLIO_FILE.exists():
-        with open(PORTFOLIO_FILE) as f:
-            return json.load(f)
+        portfolio = json_loads(PORTFOLIO_FILE.read_bytes())
+        # Older files keep closed positions inline; the next save moves them out
+        portfolio.setdefault("closed_positions", [])
+        portfolio.setdefault("n_closed", 0)
+        
+        # Anything past closed_log_bytes was appended by a save that died
+        # before portfolio.json was replaced; those positions still look
+        # open (or inline) here and will be closed again, so drop the lines
+        log_size = _closed_log_size()
+        portfolio.setdefault("closed_log_bytes", log_size)
+        if log_size > portfolio["closed_log_bytes"]:
+            os.truncate(CLOSED_POSITIONS_FILE, portfolio["closed_log_bytes"])
+        return portfolio
     
     return {
         "capital": CONFIG["initial_capital"],
         "positions": [],
         "closed_positions": [],
+        "n_closed": 0,
+        "closed_log_bytes": _closed_log_size(),
         "total_pnl": 0.0,
         "created_at": int(time.time()),
     }
 
 def save_portfolio(portfolio: Dict):
-    """Save portfolio to file."""
-    with open(PORTFOLIO_FILE, "w") as f:
-        json.dump(portfolio, f, indent=2)
+    """
+    Save portfolio to file.
+    
+    Newly closed positions are appended to closed_positions.jsonl, so the
+    summary written here stays small; it is replaced atomically so a crash
+    mid-write can't corrupt it. The summary records the log length it
+    covers, so a crash between the two writes is rolled back on next load.
+    """
+    closed = portfolio["closed_positions"]
+    if closed:
+        with open(CLOSED_POSITIONS_FILE, "ab") as f:
+            f.write(b"".join(json_dumps(pos) + b"\n" for pos in closed))
+            portfolio["closed_log_bytes"] = f.tell()
+        portfolio["n_closed"] += len(closed)
+        closed.clear()
+    
+    summary = {k: v for k, v in portfolio.items() if k != "closed_positions"}
+    tmp = PORTFOLIO_FILE.with_suffix(".tmp")
+    tmp.write_bytes(json_dumps(summary, indent=True))
+    os.replace(tmp, PORTFOLIO_FILE)
 
 def position_size_kelly(edge: float, capital: float) -> float:
     """
@@ -336,7 +639,7 @@ def execute_trade(signal: TradeSignal, portfolio: Dict) -> Optional[Position]:
     
     # Deduct from capital
     portfolio["capital"] -= size
-    portfolio["positions"].append(asdict(position))
+    portfolio["positions"].append(position.to_dict())
     
     print(f"📈 TRADE: {signal.suggested_side} {position.market_title[:50]}")
     print(f"   Size: M${size:.0f} | Prob: {signal.current_prob:.2%} | Edge: {signal.edge_percent:.1f}%")
@@ -347,12 +650,15 @@ def execute_trade(signal: TradeSignal, portfolio: Dict) -> Optional[Position]:
 def evaluate_positions(portfolio: Dict, markets: Dict[str, Market]):
     """Evaluate open positions against current market prices."""
     closed = 0
+    still_open = []
     for pos in portfolio["positions"]:
         if pos["status"] != "open":
+            still_open.append(pos)
             continue
         
         market = markets.get(pos["market_id"])
         if not market:
+            still_open.append(pos)
             continue
         
         # Simple exit: if position is profitable by >2%, close it
@@ -374,20 +680,25 @@ def evaluate_positions(portfolio: Dict, markets: Dict[str, Market]):
             
             portfolio["total_pnl"] += current_pnl
             portfolio["closed_positions"].append(pos)
-            portfolio["positions"].remove(pos)
             portfolio["capital"] += pos["size"] + current_pnl
             
             result = "✅ WIN" if current_pnl > 0 else "❌ LOSS"
             print(f"{result}: {pos['market_title'][:40]} | P&L: M${current_pnl:+.1f}")
             
             closed += 1
+        else:
+            still_open.append(pos)
     
+    # Rebuild instead of remove() while iterating, which skipped positions
+    portfolio["positions"] = still_open
     return closed
 
+_PENDING_LOG: List[bytes] = []
+
 def log_decision(signal: TradeSignal, executed: bool):
-    """Log trade decision to JSONL history."""
+    """Queue trade decision for the JSONL history (written by flush_log)."""
     entry = {
-        "timestamp": datetime.now().isoformat(),
+        "ts": time.time_ns() // 1000,  # Unix time in microseconds
         "market_id": signal.market_id,
         "market_title": signal.market_title,
         "edge_type": signal.edge_type,
@@ -398,8 +709,19 @@ def log_decision(signal: TradeSignal, executed: bool):
         "rationale": signal.rationale,
     }
     
-    with open(HISTORY_FILE, "a") as f:
-        f.write(json.dumps(entry) + "\n")
+    _PENDING_LOG.append(json_dumps(entry))
+
+def flush_log():
+    """Append queued decisions to the JSONL history in a single write."""
+    if not _PENDING_LOG:
+        return
+    with open(HISTORY_FILE, "ab") as f:
+        f.write(b"\n".join(_PENDING_LOG) + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+    _PENDING_LOG.clear()
+
+atexit.register(flush_log)  # Don't lose queued decisions if a run dies early
 
 # ============================================================================
 # Main Loop
@@ -411,25 +733,29 @@ def run_once():
     print(f"🤖 Prediction Markets Bot — {datetime.now().isoformat()}")
     print(f"{'='*70}")
     
-    # Load state
-    portfolio = load_portfolio()
-    print(f"💰 Capital: M${portfolio['capital']:.0f} | Total P&L: M${portfolio['total_pnl']:+.1f}")
-    
-    # Fetch markets
-    markets_list = get_markets()
-    if not markets_list:
-        print("❌ No markets fetched. Exiting.")
-        return
-    
-    markets_dict = {m.id: m for m in markets_list}
-    
-    # Evaluate existing positions
-    closed = evaluate_positions(portfolio, markets_dict)
-    if closed > 0:
-        print(f"📊 Closed {closed} positions")
-    
-    # Analyze for edges
-    signals = analyze_markets(markets_list)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Load state in the background while the market list downloads
+        portfolio_future = executor.submit(load_portfolio)
+        
+        # Fetch markets
+        markets_list = get_markets()
+        portfolio = portfolio_future.result()
+        print(f"💰 Capital: M${portfolio['capital']:.0f} | Total P&L: M${portfolio['total_pnl']:+.1f}")
+        if not markets_list:
+            print("❌ No markets fetched. Exiting.")
+            return
+        
+        # Start history fetches now so they overlap with position evaluation
+        histories = prefetch_histories(markets_list, executor)
+        markets_dict = {m.id: m for m in markets_list}
+        
+        # Evaluate existing positions
+        closed = evaluate_positions(portfolio, markets_dict)
+        if closed > 0:
+            print(f"📊 Closed {closed} positions")
+        
+        # Analyze for edges
+        signals = analyze_markets(markets_list, histories)
     
     # Execute trades
     executed = 0
@@ -453,10 +779,11 @@ def run_once():
     
     # Save state
     save_portfolio(portfolio)
+    flush_log()
     
     print(f"\n📊 Portfolio Summary")
     print(f"   Open positions: {len(portfolio['positions'])}")
-    print(f"   Closed positions: {len(portfolio['closed_positions'])}")
+    print(f"   Closed positions: {portfolio['n_closed']}")
     print(f"   Capital: M${portfolio['capital']:.0f}")
     print(f"   Total P&L: M${portfolio['total_pnl']:+.1f}")
 
@@ -466,14 +793,15 @@ def run_demo():
     print("   This creates synthetic markets for testing the analysis engine.\n")
     
     # Create synthetic markets
+    now = int(time.time())
     markets = [
         Market(
             id="demo-1",
             title="Will ChatGPT-5 be released by end of 2026?",
             current_probability=0.65,
             volume_24h=50000,
-            created_at=int(time.time()) - 2592000,
-            closes_at=int(time.time()) + 10886400,
+            created_at=now - 2592000,
+            closes_at=now + 10886400,
             is_resolved=False,
         ),
         Market(
@@ -481,8 +809,8 @@ def run_demo():
             title="Biden re-elected 2028?",
             current_probability=0.42,
             volume_24h=100000,
-            created_at=int(time.time()) - 86400 * 100,
-            closes_at=int(time.time()) + 86400 * 3,  # Closes in 3 days
+            created_at=now - 86400 * 100,
+            closes_at=now + 86400 * 3,  # Closes in 3 days
             is_resolved=False,
         ),
     ]
@@ -494,7 +822,7 @@ def run_demo():
     
     # Simulate trades
     for market in markets:
-        signal = detect_resolution_arbitrage(market)
+        signal = detect_resolution_arbitrage(market, now)
         if signal:
             print(f"Found edge: {signal.edge_type}")
             print(f"   Market: {signal.market_title}")
@@ -506,6 +834,7 @@ def run_demo():
             log_decision(signal, True)
     
     save_portfolio(portfolio)
+    flush_log()
     
     # Show summary
     print(f"\n📊 Demo Summary")